@@ -1,8 +1,12 @@
+from functools import lru_cache
+
 from hexrepo_cloud.storage import S3Adaptor, StorageConfig
 
 from config import config
 
 
+# One adaptor per bucket/region, so its S3 client and connection pool are reused
+@lru_cache(maxsize=8)
 def get_storage(
     bucket: str = f"{config.PROJECT}-{config.ENVIRONMENT}-example",
     region: str = config.REGION,
@@ -2,14 +2,62 @@
 Celery tasks for the {{project_slug}} application.
 """
 
+import json
 import logging
 
+import redis
 from celery import shared_task
+from celery.signals import worker_process_shutdown
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.template.loader import render_to_string
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_FROM_EMAIL = settings.DEFAULT_FROM_EMAIL
+
+# Redis list that queue_templated_email pushes to and flush_email_batch drains
+EMAIL_QUEUE_KEY = "emails:pending"
+EMAIL_BATCH_SIZE = 100
+EMAIL_MAX_ATTEMPTS = 3
+
+_redis_client = None
+
+# SMTP connection shared by every email task run in this worker process, so the
+# TCP/TLS/AUTH handshake is paid once rather than once per message.
+_smtp_connection = None
+
+
+def _get_smtp_connection():
+    """Return this process's open email connection, opening it on first use."""
+    global _smtp_connection
+    if _smtp_connection is None:
+        connection = get_connection(fail_silently=False)
+        # Opening explicitly stops send_messages() closing it after each send
+        connection.open()
+        _smtp_connection = connection
+    return _smtp_connection
+
+
+def _get_redis():
+    """Return the Redis client used for the email queue."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.EMAIL_QUEUE_URL)
+    return _redis_client
+
+
+@worker_process_shutdown.connect
+def _close_smtp_connection(**kwargs):
+    """Close the shared email connection, e.g. on shutdown or after a failure."""
+    global _smtp_connection
+    if _smtp_connection is not None:
+        try:
+            _smtp_connection.close()
+        except Exception:
+            logger.exception("Failed to close email connection")
+        _smtp_connection = None
+
 
 @shared_task
 def send_email_task(
@@ -20,11 +68,111 @@ def send_email_task(
         send_mail(
             subject=subject,
             message=message,
-            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            from_email=from_email or DEFAULT_FROM_EMAIL,
             recipient_list=recipient_list,
             fail_silently=fail_silently,
+            connection=_get_smtp_connection(),
         )
         logger.info(f"Email sent successfully to {', '.join(recipient_list)}")
     except Exception as e:
+        # The connection may have been dropped by the server; start afresh next time
+        _close_smtp_connection()
         logger.exception(f"Failed to send email: {str(e)}")
+        if not fail_silently:
+            raise
+
+
+def queue_templated_email(
+    subject, template_name, context, recipient_list, from_email=None
+):
+    """
+    Queue a templated email for the next flush_email_batch run.
+
+    The body is rendered from ``template_name`` and ``context`` when the batch
+    is flushed. Queued emails are sent in batches over a single connection
+    rather than one task per email.
+    """
+    payload = {
+        "subject": subject,
+        "template_name": template_name,
+        "context": context,
+        "recipient_list": recipient_list,
+        "from_email": from_email,
+        "attempts": 0,
+    }
+    _get_redis().lpush(EMAIL_QUEUE_KEY, json.dumps(payload))
+
+
+def _build_queued_email(payload, connection):
+    """Render a queued email payload into an EmailMessage."""
+    return EmailMessage(
+        subject=payload["subject"],
+        body=render_to_string(payload["template_name"], payload["context"]),
+        from_email=payload.get("from_email") or DEFAULT_FROM_EMAIL,
+        to=payload["recipient_list"],
+        connection=connection,
+    )
+
+
+@shared_task(ignore_result=True)
+def flush_email_batch():
+    """
+    Send up to EMAIL_BATCH_SIZE queued emails over one connection.
+
+    Run every 500ms by Celery beat. The flush stops early once more than a third
+    of the attempted sends have failed, as the mail server is then most likely
+    unavailable: unattempted emails go back to the front of the queue and failed
+    ones to the back, until they have been tried EMAIL_MAX_ATTEMPTS times.
+    """
+    client = _get_redis()
+    payloads = client.rpop(EMAIL_QUEUE_KEY, EMAIL_BATCH_SIZE)
+    if not payloads:
+        return 0
+
+    try:
+        connection = _get_smtp_connection()
+    except Exception as e:
+        # Nothing was attempted, so put the whole batch back at the front
+        client.rpush(EMAIL_QUEUE_KEY, *reversed(payloads))
+        logger.exception(f"Failed to open email connection: {str(e)}")
         raise
+
+    sent = 0
+    failed = []
+    for index, raw in enumerate(payloads):
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            # Retrying a payload that can't be decoded would never succeed
+            logger.exception(f"Dropping undecodable queued email: {raw!r}")
+            continue
+        try:
+            _build_queued_email(payload, connection).send()
+            sent += 1
+        except Exception as e:
+            logger.exception(f"Failed to send queued email: {str(e)}")
+            failed.append(payload)
+            if len(failed) * 3 > index + 1:
+                unattempted = payloads[index + 1 :]
+                if unattempted:
+                    # Reversed so the oldest email is popped first next time
+                    client.rpush(EMAIL_QUEUE_KEY, *reversed(unattempted))
+                logger.error(
+                    f"Aborted email batch after {len(failed)} of {index + 1} sends failed"
+                )
+                break
+
+    if failed:
+        _close_smtp_connection()
+        for payload in failed:
+            payload["attempts"] += 1
+            if payload["attempts"] < EMAIL_MAX_ATTEMPTS:
+                client.lpush(EMAIL_QUEUE_KEY, json.dumps(payload))
+            else:
+                logger.error(
+                    f"Dropping email to {', '.join(payload['recipient_list'])} "
+                    f"after {payload['attempts']} attempts"
+                )
+
+    logger.info(f"Sent {sent} of {len(payloads)} queued emails")
+    return sent
@@ -1,24 +1,58 @@
 import logging
+import uuid
 from typing import Any, Dict
 
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
-from django.http import HttpRequest
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+from django.http import Http404, HttpRequest
 from django.shortcuts import get_object_or_404
 from ninja import Schema
 from ninja_extra import ControllerBase, api_controller, http_get, http_post
 from ninja_extra.permissions import AllowAny
 from ninja_jwt.controller import TokenObtainPairController, TokenVerificationController
 
-from apps.core.tasks import send_email_task
+from apps.core.tasks import queue_templated_email
 
 from ..models import EmailVerification, PasswordReset
 
 logger = logging.getLogger(__name__)
 
+# Resolved once at import rather than through the settings proxy on every email
+FRONTEND_VERIFY_URL = settings.FRONTEND_VERIFY_URL
+DEFAULT_FROM_EMAIL = getattr(
+    settings, "DEFAULT_FROM_EMAIL", "noreply@{{project_slug}}.com"
+)
+
+# Final token states cached so repeated clicks skip the database. Kept no longer
+# than the shortest token lifetime (password resets expire after an hour).
+TOKEN_STATUS_CACHE_TIMEOUT = 60 * 60
+TOKEN_VERIFIED = "verified"
+TOKEN_USED = "used"
+TOKEN_EXPIRED = "expired"
+
+
+def _get_token_status(cache_key: str) -> str | None:
+    """Cached final state of a token; a cache outage just means a miss."""
+    try:
+        return cache.get(cache_key)
+    except Exception:
+        logger.exception("Failed to read token status from the cache")
+        return None
+
+
+def _set_token_status(cache_key: str, status: str) -> None:
+    """Cache a token's final state, ignoring cache errors (the DB has it)."""
+    try:
+        cache.set(cache_key, status, TOKEN_STATUS_CACHE_TIMEOUT)
+    except Exception:
+        logger.exception("Failed to write token status to the cache")
+
 
 class SignupSchema(Schema):
     """Schema for user signup."""
@@ -93,16 +127,21 @@ class SignupController(ControllerBase):
         The user account will be inactive until email verification is completed.
         """
         try:
-            # Check if username already exists
-            if User.objects.filter(username=payload.username).exists():
+            # Check if username or email already exists in a single query
+            existing_usernames = set(
+                User.objects.filter(
+                    Q(username=payload.username) | Q(email=payload.email)
+                ).values_list("username", flat=True)
+            )
+
+            if payload.username in existing_usernames:
                 return {
                     "message": "Username already exists",
                     "user_id": 0,
                     "verification_required": False,
                 }
 
-            # Check if email already exists
-            if User.objects.filter(email=payload.email).exists():
+            if existing_usernames:
                 return {
                     "message": "Email already registered",
                     "user_id": 0,
@@ -164,16 +203,47 @@ class SignupController(ControllerBase):
         Returns:
             Verification result with success/failure message
         """
+        # Reject malformed tokens before touching the cache or database
+        try:
+            uuid.UUID(token)
+        except ValueError:
+            raise Http404("Invalid verification token")
+
+        # Repeat clicks on a link whose outcome is final are answered from the cache
+        cache_key = f"ev:{token}"
+        cached_status = _get_token_status(cache_key)
+        if cached_status == TOKEN_VERIFIED:
+            return {"message": "Email already verified", "verified": True}
+        if cached_status == TOKEN_EXPIRED:
+            return {
+                "message": "Verification token has expired. Please request a new verification email.",
+                "verified": False,
+            }
+
         # Let get_object_or_404 raise the 404 exception naturally for invalid tokens
-        verification = get_object_or_404(EmailVerification, token=token)
+        verification = get_object_or_404(
+            EmailVerification.objects.select_related("user").only(
+                "id",
+                "token",
+                "is_verified",
+                "verified_at",
+                "created_at",
+                "user__id",
+                "user__username",
+                "user__is_active",
+            ),
+            token=token,
+        )
 
         try:
             # Check if already verified
             if verification.is_verified:
+                _set_token_status(cache_key, TOKEN_VERIFIED)
                 return {"message": "Email already verified", "verified": True}
 
             # Check if token is expired
             if verification.is_expired():
+                _set_token_status(cache_key, TOKEN_EXPIRED)
                 return {
                     "message": "Verification token has expired. Please request a new verification email.",
                     "verified": False,
@@ -181,6 +251,7 @@ class SignupController(ControllerBase):
 
             # Verify the email
             verification.verify()
+            _set_token_status(cache_key, TOKEN_VERIFIED)
 
             logger.info(
                 f"Email verified successfully for user {verification.user.username}"
@@ -219,13 +290,17 @@ class SignupController(ControllerBase):
                     "verification_required": False,
                 }
 
-            # Get or create verification record
-            verification, created = EmailVerification.objects.get_or_create(user=user)
+            with transaction.atomic():
+                # Lock the verification record against concurrent resends
+                verification, created = (
+                    EmailVerification.objects.select_for_update().get_or_create(
+                        user=user
+                    )
+                )
 
-            # If verification exists and is not expired, use it; otherwise create new token
-            if not created and verification.is_expired():
-                verification.delete()
-                verification = EmailVerification.objects.create(user=user)
+                # Reuse an unexpired token; otherwise issue a new one on the same row
+                if not created and verification.is_expired():
+                    verification.rotate_token()
 
             # Send verification email
             self._send_verification_email(user, verification)
@@ -257,34 +332,20 @@ class SignupController(ControllerBase):
             verification: EmailVerification instance
         """
         try:
-            subject = "Verify Your Email Address"
             # In production, this should be your actual domain
-            verification_url = (
-                f"{getattr(settings, 'FRONTEND_VERIFY_URL')}/{verification.token}"
-            )
-
-            message = f"""
-            Hi {user.first_name or user.username},
-            
-            Thank you for registering with AI Pet!
-            
-            Please click the link below to verify your email address:
-            {verification_url}
-            
-            This link will expire in 24 hours.
-            
-            If you didn't create this account, please ignore this email.
-            
-            Best regards,
-            AI Pet Team
-            """
-
-            send_email_task.delay(
-                subject=subject,
-                message=message,
-                from_email=getattr(settings, "DEFAULT_FROM_EMAIL", "noreply@{{project_slug}}.com"),
+            verification_url = f"{FRONTEND_VERIFY_URL}/{verification.token}"
+
+            # Sent in the next email batch; the body is rendered by the worker
+            queue_templated_email(
+                subject="Verify Your Email Address",
+                template_name="emails/verify_email.txt",
+                context={
+                    "name": user.first_name or user.username,
+                    "token": str(verification.token),
+                    "verification_url": verification_url,
+                },
+                from_email=DEFAULT_FROM_EMAIL,
                 recipient_list=[user.email],
-                fail_silently=False,
             )
 
         except Exception as e:
@@ -306,13 +367,15 @@ class SignupController(ControllerBase):
             # Always return success to prevent email enumeration
             # But only send email if user exists
             try:
-                user = User.objects.get(email=payload.email)
+                user = User.objects.only(
+                    "id", "is_active", "username", "email", "first_name"
+                ).get(email=payload.email)
 
                 # Only send reset email if user is active
                 if user.is_active:
                     # Invalidate any existing password reset tokens for this user
                     PasswordReset.objects.filter(user=user, is_used=False).update(
-                        is_used=True
+                        is_used=True, used_at=Now(), updated_at=Now()
                     )
 
                     # Create new password reset token
@@ -328,7 +391,6 @@ class SignupController(ControllerBase):
                 logger.info(
                     f"Password reset requested for non-existent email: {payload.email}"
                 )
-                pass
 
             return {
                 "message": "If the email exists in our system, a password reset link has been sent.",
@@ -355,22 +417,40 @@ class SignupController(ControllerBase):
         Returns:
             Success/failure message
         """
+        # Reject malformed tokens before touching the cache, database or hasher
         try:
-            # Get the password reset token
+            uuid.UUID(payload.token)
+        except ValueError:
+            return {"message": "Invalid or expired reset token.", "success": False}
+
+        # Tokens already used are answered from the cache
+        cache_key = f"pr:{payload.token}"
+        if _get_token_status(cache_key) == TOKEN_USED:
+            return {"message": "Invalid or expired reset token.", "success": False}
+
+        try:
+            # Get the password reset token, if it is unused and unexpired
             try:
-                reset_token = PasswordReset.objects.get(
-                    token=payload.token, is_used=False
+                # Load only the user columns needed for password validation
+                reset_token = (
+                    PasswordReset.objects.active()
+                    .select_related("user")
+                    .only(
+                        "id",
+                        "token",
+                        "is_used",
+                        "created_at",
+                        "user__id",
+                        "user__username",
+                        "user__email",
+                        "user__first_name",
+                        "user__last_name",
+                    )
+                    .get(token=payload.token)
                 )
             except PasswordReset.DoesNotExist:
                 return {"message": "Invalid or expired reset token.", "success": False}
 
-            # Check if token is expired
-            if reset_token.is_expired():
-                return {
-                    "message": "Password reset token has expired. Please request a new one.",
-                    "success": False,
-                }
-
             # Validate the new password
             try:
                 validate_password(payload.new_password, reset_token.user)
@@ -380,16 +460,29 @@ class SignupController(ControllerBase):
                     "success": False,
                 }
 
-            # Update the user's password
             user = reset_token.user
             user.set_password(payload.new_password)
-            user.save()
-
-            # Mark the reset token as used
-            reset_token.mark_as_used()
 
-            # Invalidate any other unused reset tokens for this user
-            PasswordReset.objects.filter(user=user, is_used=False).update(is_used=True)
+            with transaction.atomic():
+                # Claim the token first; a concurrent confirm that already used it
+                # leaves nothing to update, so only one request sets a password
+                claimed = PasswordReset.objects.filter(
+                    pk=reset_token.pk, is_used=False
+                ).update(is_used=True, used_at=Now(), updated_at=Now())
+                if not claimed:
+                    return {
+                        "message": "Invalid or expired reset token.",
+                        "success": False,
+                    }
+
+                # Update the user's password
+                user.save(update_fields=["password"])
+
+                # Mark any other unused reset tokens for the user as used
+                PasswordReset.objects.filter(user=user, is_used=False).update(
+                    is_used=True, used_at=Now(), updated_at=Now()
+                )
+            _set_token_status(cache_key, TOKEN_USED)
 
             logger.info(f"Password successfully reset for user {user.username}")
 
@@ -416,43 +509,20 @@ class SignupController(ControllerBase):
             reset_token: PasswordReset instance
         """
         try:
-            subject = "Reset Your Password"
             # In production, this should be your actual domain
             reset_url = "http://localhost:8000/api/v1/auth/password-reset/confirm"
 
-            {% raw %}
-            message = f"""
-            Hi {user.first_name or user.username},
-            
-            You have requested to reset your password for your AI Pet account.
-            
-            Please use the following token to reset your password:
-            Token: {reset_token.token}
-            
-            You can reset your password by making a POST request to:
-            {reset_url}
-            
-            With the following JSON payload:
-            {{
-                "token": "{reset_token.token}",
-                "new_password": "your_new_password"
-            }}
-            
-            This token will expire in 1 hour.
-            
-            If you didn't request this password reset, please ignore this email.
-            
-            Best regards,
-            AI Pet Team
-            """
-            {% endraw %}
-
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=getattr(settings, "DEFAULT_FROM_EMAIL", "noreply@{{project_slug}}.com"),
+            # Sent in the next email batch; the body is rendered by the worker
+            queue_templated_email(
+                subject="Reset Your Password",
+                template_name="emails/password_reset.txt",
+                context={
+                    "name": user.first_name or user.username,
+                    "token": str(reset_token.token),
+                    "reset_url": reset_url,
+                },
+                from_email=DEFAULT_FROM_EMAIL,
                 recipient_list=[user.email],
-                fail_silently=False,
             )
 
         except Exception as e:
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = "login_auth_user_email_idx"
+
+
+def create_email_index(apps, schema_editor):
+    """Index the email column of whichever model AUTH_USER_MODEL points to."""
+    user_model = apps.get_model(settings.AUTH_USER_MODEL)
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS %s ON %s (%s)"
+        % (
+            schema_editor.quote_name(INDEX_NAME),
+            schema_editor.quote_name(user_model._meta.db_table),
+            schema_editor.quote_name(user_model._meta.get_field("email").column),
+        )
+    )
+
+
+def drop_email_index(apps, schema_editor):
+    schema_editor.execute(
+        "DROP INDEX IF EXISTS %s" % schema_editor.quote_name(INDEX_NAME)
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    Index the user model's email column so the signup duplicate check can use an
+    index scan for both sides of its username/email OR lookup (username is
+    already covered by its unique constraint).
+
+    The user model belongs to another app, so the index is created directly
+    rather than through AddIndex; Django's migration state does not track it.
+    """
+
+    dependencies = [
+        ("login", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_email_index, drop_email_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-15 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("login", "0002_auth_user_email_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="passwordreset",
+            index=models.Index(
+                fields=["user", "is_used"], name="login_pwreset_user_used_idx"
+            ),
+        ),
+    ]
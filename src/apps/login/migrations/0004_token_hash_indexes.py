@@ -0,0 +1,35 @@
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class AddPostgresIndex(migrations.AddIndex):
+    """AddIndex that only runs on PostgreSQL, leaving the SQLite fallback alone."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("login", "0003_passwordreset_indexes"),
+    ]
+
+    operations = [
+        AddPostgresIndex(
+            model_name="emailverification",
+            index=django.contrib.postgres.indexes.HashIndex(
+                fields=["token"], name="login_ev_token_hash"
+            ),
+        ),
+        AddPostgresIndex(
+            model_name="passwordreset",
+            index=django.contrib.postgres.indexes.HashIndex(
+                fields=["token"], name="login_pr_token_hash"
+            ),
+        ),
+    ]
@@ -2,7 +2,8 @@ import uuid
 from datetime import timedelta
 
 from django.contrib.auth.models import User
-from django.db import models
+from django.contrib.postgres.indexes import HashIndex
+from django.db import models, transaction
 from django.utils import timezone
 
 from apps.core.models import BaseModel
@@ -19,6 +20,12 @@ class EmailVerification(BaseModel):
     verified_at = models.DateTimeField(null=True, blank=True)
     is_verified = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Point lookups by token; the unique b-tree still enforces uniqueness
+            HashIndex(fields=["token"], name="login_ev_token_hash"),
+        ]
+
     def is_expired(self):
         """Check if the verification token has expired (24 hours)."""
         return timezone.now() > self.created_at + timedelta(hours=24)
@@ -27,11 +34,35 @@ class EmailVerification(BaseModel):
         """Mark the verification as completed."""
         if self.is_verified:
             return
+        now = timezone.now()
+        with transaction.atomic():
+            User.objects.filter(pk=self.user_id).update(is_active=True)
+            EmailVerification.objects.filter(pk=self.pk).update(
+                is_verified=True, verified_at=now, updated_at=now
+            )
         self.is_verified = True
-        self.verified_at = timezone.now()
-        self.user.is_active = True
-        self.user.save()
-        self.save()
+        self.verified_at = now
+        self.updated_at = now
+        # Keep an already loaded user in sync without fetching it
+        if EmailVerification.user.is_cached(self):
+            self.user.is_active = True
+
+    def rotate_token(self):
+        """Issue a fresh token on this record, restarting the 24 hour window."""
+        now = timezone.now()
+        token = uuid.uuid4()
+        EmailVerification.objects.filter(pk=self.pk).update(
+            token=token,
+            created_at=now,
+            updated_at=now,
+            is_verified=False,
+            verified_at=None,
+        )
+        self.token = token
+        self.created_at = now
+        self.updated_at = now
+        self.is_verified = False
+        self.verified_at = None
 
     def __str__(self):
         return f"Email verification for {self.user.username}"
@@ -2,15 +2,29 @@ import uuid
 from datetime import timedelta
 
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import HashIndex
 from django.db import models
 from django.utils import timezone
 
 from apps.core.models import BaseModel
 
 
+class PasswordResetQuerySet(models.QuerySet):
+    """QuerySet for PasswordReset tokens."""
+
+    def active(self):
+        """Tokens that are unused and not yet expired, filtered in the database."""
+        return self.filter(
+            is_used=False, created_at__gt=timezone.now() - PasswordReset.EXPIRY
+        )
+
+
 class PasswordReset(BaseModel):
     """Model to store password reset tokens."""
 
+    # How long a reset token stays valid
+    EXPIRY = timedelta(hours=1)
+
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="password_resets"
     )
@@ -19,17 +33,32 @@ class PasswordReset(BaseModel):
     used_at = models.DateTimeField(null=True, blank=True)
     is_used = models.BooleanField(default=False)
 
+    objects = PasswordResetQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "is_used"], name="login_pwreset_user_used_idx"
+            ),
+            # Point lookups by token; the unique b-tree still enforces uniqueness
+            HashIndex(fields=["token"], name="login_pr_token_hash"),
+        ]
+
     def is_expired(self):
         """Check if the reset token has expired (1 hour)."""
-        return timezone.now() > self.created_at + timedelta(hours=1)
+        return timezone.now() > self.created_at + self.EXPIRY
 
     def mark_as_used(self):
         """Mark the reset token as used."""
         if self.is_used:
             return
+        now = timezone.now()
+        PasswordReset.objects.filter(pk=self.pk).update(
+            is_used=True, used_at=now, updated_at=now
+        )
         self.is_used = True
-        self.used_at = timezone.now()
-        self.save()
+        self.used_at = now
+        self.updated_at = now
 
     def __str__(self):
         return f"Password reset for {self.user.username}"
@@ -16,9 +16,10 @@ from apps.login.models import EmailVerification, PasswordReset
 class EmailVerificationModelTest(TestCase):
     """Test EmailVerification model functionality."""
 
-    def setUp(self):
-        """Set up test data."""
-        self.user = User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data shared by every test in the class."""
+        cls.user = User.objects.create_user(
             username="testuser",
             email="test@example.com",
             password="testpass123",
@@ -104,9 +105,10 @@ class EmailVerificationModelTest(TestCase):
 class PasswordResetModelTest(TestCase):
     """Test PasswordReset model functionality."""
 
-    def setUp(self):
-        """Set up test data."""
-        self.user = User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data shared by every test in the class."""
+        cls.user = User.objects.create_user(
             username="testuser", email="test@example.com", password="testpass123"
         )
 
@@ -151,6 +153,17 @@ class PasswordResetModelTest(TestCase):
         # Should be expired (boundary condition)
         self.assertTrue(reset.is_expired())
 
+    def test_active_excludes_used_and_expired(self):
+        """Test that active() only returns unused, unexpired tokens."""
+        active = PasswordReset.objects.create(user=self.user)
+        used = PasswordReset.objects.create(user=self.user)
+        used.mark_as_used()
+        expired = PasswordReset.objects.create(user=self.user)
+        expired.created_at = timezone.now() - timedelta(hours=2)
+        expired.save()
+
+        self.assertEqual(list(PasswordReset.objects.active()), [active])
+
     def test_mark_as_used(self):
         """Test marking a reset token as used."""
         reset = PasswordReset.objects.create(user=self.user)
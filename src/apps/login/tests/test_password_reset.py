@@ -4,18 +4,45 @@ Tests for password reset functionality.
 
 import json
 from datetime import timedelta
+from unittest.mock import patch
 
 import pytest
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from apps.login.models import PasswordReset
 
 
+@pytest.fixture
+def reset(request, user_factory):
+    """
+    Password reset token in the state named by the test's parameter.
+
+    One of "valid", "expired", "used" or "missing" (never saved).
+    """
+    if request.param == "missing":
+        return PasswordReset()
+
+    reset = PasswordReset.objects.create(user=user_factory(is_active=True))
+    if request.param == "expired":
+        reset.created_at = timezone.now() - timedelta(hours=2)
+        reset.save()
+    elif request.param == "used":
+        reset.mark_as_used()
+    return reset
+
+
 @pytest.mark.django_db
 class TestPasswordResetEndpoints:
     """Test password reset functionality."""
 
-    def test_request_password_reset_success(self, api_client, user_factory, mailbox):
+    @patch("apps.login.controllers.login.queue_templated_email", return_value=None)
+    def test_request_password_reset_success(
+        self, mock_queue_email, api_client, user_factory
+    ):
         """Test successful password reset request."""
         user = user_factory(is_active=True)
 
@@ -33,9 +60,12 @@ class TestPasswordResetEndpoints:
         reset = PasswordReset.objects.get(user=user)
         assert not reset.is_used
 
-        # Check email was sent
-        assert len(mailbox) == 1
-        assert user.email in mailbox[0].to
+        # Check email was queued for the next batch
+        mock_queue_email.assert_called_once()
+        call_args = mock_queue_email.call_args
+        assert call_args.kwargs["subject"] == "Reset Your Password"
+        assert user.email in call_args.kwargs["recipient_list"]
+        assert call_args.kwargs["context"]["token"] == str(reset.token)
 
     def test_request_password_reset_nonexistent_email(self, api_client):
         """Test password reset request for non-existent email."""
@@ -51,7 +81,7 @@ class TestPasswordResetEndpoints:
         assert "reset link has been sent" in data["message"]
 
         # No reset token should be created
-        assert PasswordReset.objects.count() == 0
+        assert not PasswordReset.objects.exists()
 
     def test_request_password_reset_inactive_user(self, api_client, user_factory):
         """Test password reset request for inactive user."""
@@ -68,31 +98,42 @@ class TestPasswordResetEndpoints:
         assert data["success"] is True
 
         # No reset token should be created for inactive user
-        assert PasswordReset.objects.filter(user=user).count() == 0
+        assert not PasswordReset.objects.filter(user=user).exists()
 
+    @patch("apps.login.controllers.login.queue_templated_email", return_value=None)
     def test_request_password_reset_invalidates_existing_tokens(
-        self, api_client, user_factory
+        self, mock_queue_email, api_client, user_factory
     ):
         """Test that requesting reset invalidates existing tokens."""
         user = user_factory(is_active=True)
 
-        # Create existing reset token
-        existing_reset = PasswordReset.objects.create(user=user)
-        assert not existing_reset.is_used
-
-        response = api_client.post_json(
-            "/api/v1/auth/password-reset/request", {"email": user.email}
+        # Create existing reset tokens
+        existing_resets = PasswordReset.objects.bulk_create(
+            [PasswordReset(user=user) for _ in range(3)]
         )
 
-        assert response.status_code == 200
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.post_json(
+                "/api/v1/auth/password-reset/request", {"email": user.email}
+            )
 
-        # Check existing token is now marked as used
-        existing_reset.refresh_from_db()
-        assert existing_reset.is_used
+        assert response.status_code == 200
 
-        # Check new token was created
-        new_tokens = PasswordReset.objects.filter(user=user, is_used=False)
-        assert new_tokens.count() == 1
+        # Check existing tokens are now marked as used, in a single UPDATE
+        assert PasswordReset.objects.filter(
+            pk__in=[reset.pk for reset in existing_resets],
+            is_used=True,
+            used_at__isnull=False,
+        ).count() == len(existing_resets)
+        updates = [
+            q
+            for q in queries.captured_queries
+            if q["sql"].startswith('UPDATE "login_passwordreset"')
+        ]
+        assert len(updates) == 1
+
+        # Check exactly one new token was created (get() raises otherwise)
+        PasswordReset.objects.get(user=user, is_used=False)
 
     def test_confirm_password_reset_success(self, api_client, user_factory):
         """Test successful password reset confirmation."""
@@ -112,57 +153,37 @@ class TestPasswordResetEndpoints:
         assert "successfully reset" in data["message"]
 
         # Check password was changed
-        user.refresh_from_db()
-        assert user.password != old_password
-        assert user.check_password("newsecurepass456")
+        new_password = User.objects.values_list("password", flat=True).get(pk=user.pk)
+        assert new_password != old_password
+        assert check_password("newsecurepass456", new_password)
 
         # Check token was marked as used
-        reset.refresh_from_db()
-        assert reset.is_used
-        assert reset.used_at is not None
-
-    def test_confirm_password_reset_invalid_token(self, api_client, uuid_token):
-        """Test password reset with invalid token."""
-        response = api_client.post_json(
-            "/api/v1/auth/password-reset/confirm",
-            {"token": uuid_token, "new_password": "newsecurepass456"},
-        )
-
-        assert response.status_code == 200
-        data = json.loads(response.content)
+        assert PasswordReset.objects.filter(
+            pk=reset.pk, is_used=True, used_at__isnull=False
+        ).exists()
 
-        assert data["success"] is False
-        assert "Invalid or expired" in data["message"]
-
-    def test_confirm_password_reset_expired_token(self, api_client, user_factory):
-        """Test password reset with expired token."""
+    def test_confirm_password_reset_fetches_user_in_same_query(
+        self, api_client, user_factory
+    ):
+        """Test that the reset token and its user are loaded in one SELECT."""
         user = user_factory(is_active=True)
         reset = PasswordReset.objects.create(user=user)
 
-        # Make token expired
-        reset.created_at = timezone.now() - timedelta(hours=2)
-        reset.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.post_json(
+                "/api/v1/auth/password-reset/confirm",
+                {"token": str(reset.token), "new_password": "newsecurepass456"},
+            )
 
-        response = api_client.post_json(
-            "/api/v1/auth/password-reset/confirm",
-            {"token": str(reset.token), "new_password": "newsecurepass456"},
-        )
-
-        assert response.status_code == 200
-        data = json.loads(response.content)
-
-        assert data["success"] is False
-        assert "expired" in data["message"]
-
-    def test_confirm_password_reset_used_token(self, api_client, user_factory):
-        """Test password reset with already used token."""
-        user = user_factory(is_active=True)
-        reset = PasswordReset.objects.create(user=user)
-        reset.mark_as_used()
+        assert json.loads(response.content)["success"] is True
+        selects = [q for q in queries.captured_queries if q["sql"].startswith("SELECT")]
+        assert len(selects) == 1
 
+    def test_confirm_password_reset_malformed_token(self, api_client):
+        """Test password reset with a token that is not a UUID."""
         response = api_client.post_json(
             "/api/v1/auth/password-reset/confirm",
-            {"token": str(reset.token), "new_password": "newsecurepass456"},
+            {"token": "not-a-token", "new_password": "newsecurepass456"},
         )
 
         assert response.status_code == 200
@@ -171,32 +192,40 @@ class TestPasswordResetEndpoints:
         assert data["success"] is False
         assert "Invalid or expired" in data["message"]
 
-    def test_confirm_password_reset_weak_password(self, api_client, user_factory):
-        """Test password reset with weak password."""
-        user = user_factory(is_active=True)
-        reset = PasswordReset.objects.create(user=user)
-
+    @pytest.mark.parametrize(
+        "reset,new_password,msg_frag",
+        [
+            ("missing", "newsecurepass456", "Invalid or expired"),
+            ("expired", "newsecurepass456", "expired"),
+            ("used", "newsecurepass456", "Invalid or expired"),
+            ("valid", "123", "Password validation failed"),  # Too weak
+        ],
+        indirect=["reset"],
+        ids=["invalid_token", "expired_token", "used_token", "weak_password"],
+    )
+    def test_confirm_password_reset_failure(
+        self, api_client, reset, new_password, msg_frag
+    ):
+        """Test password reset confirmation failures."""
         response = api_client.post_json(
             "/api/v1/auth/password-reset/confirm",
-            {
-                "token": str(reset.token),
-                "new_password": "123",  # Too weak
-            },
+            {"token": str(reset.token), "new_password": new_password},
         )
 
         assert response.status_code == 200
         data = json.loads(response.content)
 
         assert data["success"] is False
-        assert "Password validation failed" in data["message"]
+        assert msg_frag in data["message"]
 
     def test_confirm_password_reset_invalidates_other_tokens(
         self, api_client, user_factory
     ):
         """Test that successful reset invalidates all other tokens for user."""
         user = user_factory(is_active=True)
-        reset1 = PasswordReset.objects.create(user=user)
-        PasswordReset.objects.create(user=user)
+        reset1, _ = PasswordReset.objects.bulk_create(
+            [PasswordReset(user=user), PasswordReset(user=user)]
+        )
 
         response = api_client.post_json(
             "/api/v1/auth/password-reset/confirm",
@@ -206,6 +235,32 @@ class TestPasswordResetEndpoints:
         assert response.status_code == 200
 
         # Check all tokens for user are now marked as used
-        for reset in PasswordReset.objects.filter(user=user):
-            reset.refresh_from_db()
-            assert reset.is_used
+        assert set(
+            PasswordReset.objects.filter(user=user).values_list("is_used", flat=True)
+        ) == {True}
+
+    def test_confirm_password_reset_token_used_concurrently(
+        self, api_client, user_factory
+    ):
+        """Test that a token redeemed after the lookup cannot set a password."""
+        user = user_factory(is_active=True)
+        reset = PasswordReset.objects.create(user=user)
+        old_password = user.password
+
+        # Another request redeems the token while this one validates the password
+        with patch(
+            "apps.login.controllers.login.validate_password",
+            side_effect=lambda *args: reset.mark_as_used(),
+        ):
+            response = api_client.post_json(
+                "/api/v1/auth/password-reset/confirm",
+                {"token": str(reset.token), "new_password": "newsecurepass456"},
+            )
+
+        data = json.loads(response.content)
+        assert data["success"] is False
+        assert "Invalid or expired" in data["message"]
+        assert (
+            User.objects.values_list("password", flat=True).get(pk=user.pk)
+            == old_password
+        )
@@ -4,27 +4,35 @@ Tests for signup functionality.
 
 import json
 from datetime import timedelta
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, patch
 
 import pytest
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from apps.login.models import EmailVerification
 
 
+def flush_queued_emails(email_queue):
+    """Send everything queued on the email_queue mock, oldest first."""
+    from apps.core.tasks import flush_email_batch
+
+    email_queue.rpop.return_value = [
+        call.args[1] for call in email_queue.lpush.call_args_list
+    ]
+    return flush_email_batch()
+
+
 @pytest.mark.django_db
 class TestSignupEndpoints:
     """Test SignupController signup-related endpoints."""
 
-    @patch("apps.core.tasks.send_email_task.delay")
     def test_signup_success(
-        self, mock_send_email_task, api_client, sample_user_data, mailbox
+        self, api_client, sample_user_data, email_queue, mailoutbox
     ):
         """Test successful user signup."""
-        # Mock the Celery task to return a mock result
-        mock_send_email_task.return_value = MagicMock()
-
         response = api_client.post_json("/api/v1/auth/signup", sample_user_data)
 
         assert response.status_code == 200
@@ -43,13 +51,14 @@ class TestSignupEndpoints:
         verification = EmailVerification.objects.get(user=user)
         assert not verification.is_verified
 
-        # Verify Celery task was called with correct parameters
-        mock_send_email_task.assert_called_once()
-        call_args = mock_send_email_task.call_args
-        assert call_args.kwargs["subject"] == "Verify Your Email Address"
-        assert sample_user_data["email"] in call_args.kwargs["recipient_list"]
-        assert str(verification.token) in call_args.kwargs["message"]
-        assert "noreply@{{project_slug}}.com" == call_args.kwargs["from_email"]
+        # Verify the verification email was queued and is sent by the flush
+        assert flush_queued_emails(email_queue) == 1
+        assert len(mailoutbox) == 1
+        email = mailoutbox[0]
+        assert email.subject == "Verify Your Email Address"
+        assert sample_user_data["email"] in email.to
+        assert str(verification.token) in email.body
+        assert "noreply@{{project_slug}}.com" == email.from_email
 
     def test_signup_duplicate_username(
         self, api_client, sample_user_data, user_factory
@@ -83,9 +92,9 @@ class TestSignupEndpoints:
 
     def test_signup_weak_password(self, api_client, sample_user_data):
         """Test signup with weak password."""
-        sample_user_data["password"] = "123"  # Too weak
+        payload = {**sample_user_data, "password": "123"}  # Too weak
 
-        response = api_client.post_json("/api/v1/auth/signup", sample_user_data)
+        response = api_client.post_json("/api/v1/auth/signup", payload)
 
         assert response.status_code == 200
         data = json.loads(response.content)
@@ -94,12 +103,9 @@ class TestSignupEndpoints:
         assert "Password validation failed" in data["message"]
         assert data["user_id"] == 0
 
-    @patch("apps.core.tasks.send_email_task.delay")
-    def test_signup_email_failure(
-        self, mock_send_email_task, api_client, sample_user_data
-    ):
-        """Test signup when email sending fails."""
-        mock_send_email_task.side_effect = Exception("Email failed")
+    def test_signup_email_failure(self, api_client, sample_user_data, email_queue):
+        """Test signup when the email cannot be queued."""
+        email_queue.lpush.side_effect = Exception("Email queue unavailable")
 
         response = api_client.post_json("/api/v1/auth/signup", sample_user_data)
 
@@ -110,8 +116,8 @@ class TestSignupEndpoints:
         assert "error occurred during registration" in data["message"]
         assert data["user_id"] == 0
 
-        # Verify Celery task was called but failed
-        mock_send_email_task.assert_called_once()
+        # Verify the email was attempted but failed
+        email_queue.lpush.assert_called_once()
 
 
 @pytest.mark.django_db
@@ -133,10 +139,53 @@ class TestEmailVerificationEndpoints:
         assert "successfully" in data["message"]
 
         # Check user is now active
-        user.refresh_from_db()
-        verification.refresh_from_db()
-        assert user.is_active
-        assert verification.is_verified
+        assert User.objects.values_list("is_active", flat=True).get(pk=user.pk)
+        assert EmailVerification.objects.values_list("is_verified", flat=True).get(
+            pk=verification.pk
+        )
+
+    def test_verify_email_fetches_user_in_same_query(self, api_client, user_factory):
+        """Test that the verification and its user are loaded in one SELECT."""
+        user = user_factory(is_active=False)
+        verification = EmailVerification.objects.create(user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(f"/api/v1/auth/verify/{verification.token}")
+
+        assert response.status_code == 200
+        selects = [q for q in queries.captured_queries if q["sql"].startswith("SELECT")]
+        assert len(selects) == 1
+
+    def test_verify_email_repeat_served_from_cache(
+        self, api_client, user_factory, django_assert_num_queries
+    ):
+        """Test that re-verifying a verified token does not hit the database."""
+        user = user_factory(is_active=False)
+        verification = EmailVerification.objects.create(user=user)
+        api_client.get(f"/api/v1/auth/verify/{verification.token}")
+
+        with django_assert_num_queries(0):
+            response = api_client.get(f"/api/v1/auth/verify/{verification.token}")
+
+        assert response.status_code == 200
+        data = json.loads(response.content)
+
+        assert data["verified"] is True
+        assert "already verified" in data["message"]
+
+    @patch("apps.login.controllers.login.cache")
+    def test_verify_email_cache_unavailable(self, mock_cache, api_client, user_factory):
+        """Test that a cache outage does not fail an otherwise valid verification."""
+        mock_cache.get.side_effect = ConnectionError("Cache down")
+        mock_cache.set.side_effect = ConnectionError("Cache down")
+        user = user_factory(is_active=False)
+        verification = EmailVerification.objects.create(user=user)
+
+        response = api_client.get(f"/api/v1/auth/verify/{verification.token}")
+
+        assert response.status_code == 200
+        assert json.loads(response.content)["verified"] is True
+        assert User.objects.values_list("is_active", flat=True).get(pk=user.pk)
 
     def test_verify_email_invalid_token(self, api_client, uuid_token):
         """Test email verification with invalid token."""
@@ -144,6 +193,12 @@ class TestEmailVerificationEndpoints:
 
         assert response.status_code == 404  # get_object_or_404 returns 404
 
+    def test_verify_email_malformed_token(self, api_client):
+        """Test email verification with a token that is not a UUID."""
+        response = api_client.get("/api/v1/auth/verify/not-a-token")
+
+        assert response.status_code == 404
+
     def test_verify_email_already_verified(self, api_client, user_factory):
         """Test verifying already verified email."""
         user = user_factory(is_active=True)
@@ -174,14 +229,10 @@ class TestEmailVerificationEndpoints:
         assert data["verified"] is False
         assert "expired" in data["message"]
 
-    @patch("apps.core.tasks.send_email_task.delay")
     def test_resend_verification_success(
-        self, mock_send_email_task, api_client, user_factory, mailbox
+        self, api_client, user_factory, email_queue, mailoutbox
     ):
         """Test successful verification email resend."""
-        # Mock the Celery task to return a mock result
-        mock_send_email_task.return_value = MagicMock()
-
         user = user_factory(is_active=False)
         verification = EmailVerification.objects.create(user=user)
 
@@ -195,13 +246,40 @@ class TestEmailVerificationEndpoints:
         assert data["verification_required"] is True
         assert "email sent" in data["message"]
 
-        # Verify Celery task was called with correct parameters
-        mock_send_email_task.assert_called_once()
-        call_args = mock_send_email_task.call_args
-        assert call_args.kwargs["subject"] == "Verify Your Email Address"
-        assert user.email in call_args.kwargs["recipient_list"]
-        assert str(verification.token) in call_args.kwargs["message"]
-        assert "noreply@{{project_slug}}.com" == call_args.kwargs["from_email"]
+        # Verify the verification email was queued and is sent by the flush
+        assert flush_queued_emails(email_queue) == 1
+        assert len(mailoutbox) == 1
+        email = mailoutbox[0]
+        assert email.subject == "Verify Your Email Address"
+        assert user.email in email.to
+        assert str(verification.token) in email.body
+        assert "noreply@{{project_slug}}.com" == email.from_email
+
+    @patch("apps.login.controllers.login.queue_templated_email", return_value=None)
+    def test_resend_verification_expired_token(
+        self, mock_queue_email, api_client, user_factory
+    ):
+        """Test that resending an expired verification rotates its token in place."""
+        user = user_factory(is_active=False)
+        verification = EmailVerification.objects.create(user=user)
+        verification.created_at = timezone.now() - timedelta(hours=25)
+        verification.save()
+        old_token = verification.token
+
+        response = api_client.post_json(
+            "/api/v1/auth/resend-verification", {"email": user.email}
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.content)
+        assert data["verification_required"] is True
+
+        rotated = EmailVerification.objects.get(user=user)
+        assert rotated.pk == verification.pk
+        assert rotated.token != old_token
+        assert not rotated.is_expired()
+        context = mock_queue_email.call_args.kwargs["context"]
+        assert context["token"] == str(rotated.token)
 
     def test_resend_verification_already_verified(self, api_client, user_factory):
         """Test resending verification for already verified user."""
@@ -226,7 +304,6 @@ class TestEmailVerificationEndpoints:
         assert response.status_code == 404  # get_object_or_404 returns 404
 
 
-@pytest.mark.django_db
 class TestCeleryEmailTask:
     """Test the Celery email task directly."""
 
@@ -254,6 +331,7 @@ class TestCeleryEmailTask:
             from_email="from@example.com",
             recipient_list=["test@example.com"],
             fail_silently=False,
+            connection=ANY,
         )
 
     @patch("apps.core.tasks.send_mail")
@@ -271,3 +349,110 @@ class TestCeleryEmailTask:
                 message="Test message",
                 recipient_list=["test@example.com"],
             )
+
+    @patch("apps.core.tasks._get_redis")
+    def test_flush_email_batch(self, mock_get_redis, mailoutbox):
+        """Test that queued emails are rendered and sent in one flush."""
+        from apps.core.tasks import flush_email_batch
+
+        mock_get_redis.return_value.rpop.return_value = [
+            json.dumps(
+                {
+                    "subject": "Verify Your Email Address",
+                    "template_name": "emails/verify_email.txt",
+                    "context": {"name": "Test", "verification_url": f"url-{i}"},
+                    "recipient_list": [f"user{i}@example.com"],
+                    "from_email": None,
+                    "attempts": 0,
+                }
+            )
+            for i in range(2)
+        ]
+
+        assert flush_email_batch() == 2
+
+        assert [email.to for email in mailoutbox] == [
+            ["user0@example.com"],
+            ["user1@example.com"],
+        ]
+        assert "url-1" in mailoutbox[1].body
+
+    def test_queued_email_is_sent_by_flush(self, email_queue, mailoutbox):
+        """Test that what queue_templated_email pushes is what the flush sends."""
+        from apps.core.tasks import EMAIL_QUEUE_KEY, queue_templated_email
+
+        queue_templated_email(
+            subject="Verify Your Email Address",
+            template_name="emails/verify_email.txt",
+            context={
+                "name": "O'Brien",
+                "token": "abc",
+                "verification_url": "http://testserver/verify/abc",
+            },
+            recipient_list=["test@example.com"],
+        )
+
+        email_queue.lpush.assert_called_once_with(EMAIL_QUEUE_KEY, ANY)
+        assert flush_queued_emails(email_queue) == 1
+
+        assert len(mailoutbox) == 1
+        assert mailoutbox[0].subject == "Verify Your Email Address"
+        assert mailoutbox[0].to == ["test@example.com"]
+        # Rendered without HTML escaping, as it is a plain text email
+        assert "Hi O'Brien," in mailoutbox[0].body
+        assert "http://testserver/verify/abc" in mailoutbox[0].body
+
+    @patch("apps.core.tasks.EmailMessage.send", side_effect=Exception("SMTP Error"))
+    @patch("apps.core.tasks._get_redis")
+    def test_flush_email_batch_aborts_on_failures(self, mock_get_redis, mock_send):
+        """Test that a failing flush stops early and requeues its emails."""
+        from apps.core.tasks import EMAIL_QUEUE_KEY, flush_email_batch
+
+        payloads = [
+            json.dumps(
+                {
+                    "subject": "Subject",
+                    "template_name": "emails/verify_email.txt",
+                    "context": {},
+                    "recipient_list": [f"user{i}@example.com"],
+                    "from_email": None,
+                    "attempts": 0,
+                }
+            )
+            for i in range(3)
+        ]
+        redis_client = mock_get_redis.return_value
+        redis_client.rpop.return_value = payloads
+
+        assert flush_email_batch() == 0
+
+        # Only the first send is attempted before the batch is abandoned
+        mock_send.assert_called_once()
+        redis_client.rpush.assert_called_once_with(
+            EMAIL_QUEUE_KEY, payloads[2], payloads[1]
+        )
+        requeued = json.loads(redis_client.lpush.call_args.args[1])
+        assert requeued["recipient_list"] == ["user0@example.com"]
+        assert requeued["attempts"] == 1
+
+    @patch(
+        "apps.core.tasks._get_smtp_connection",
+        side_effect=ConnectionRefusedError("SMTP down"),
+    )
+    @patch("apps.core.tasks._get_redis")
+    def test_flush_email_batch_requeues_when_connection_fails(
+        self, mock_get_redis, mock_get_connection
+    ):
+        """Test that no popped email is lost when the mail server is down."""
+        from apps.core.tasks import EMAIL_QUEUE_KEY, flush_email_batch
+
+        payloads = [b"first", b"second"]
+        redis_client = mock_get_redis.return_value
+        redis_client.rpop.return_value = payloads
+
+        with pytest.raises(ConnectionRefusedError):
+            flush_email_batch()
+
+        redis_client.rpush.assert_called_once_with(
+            EMAIL_QUEUE_KEY, b"second", b"first"
+        )
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-15 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("{{project_slug}}", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="{{project_slug}}",
+            name="name",
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
@@ -4,7 +4,7 @@ from apps.core.models import BaseModel
 
 
 class {{project_slug|capitalize}}(BaseModel):
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, db_index=True)
     description = models.TextField()
 
     def __str__(self):
@@ -12,8 +12,12 @@ logging.getLogger("faker.factory").setLevel(logging.ERROR)
 
 ENV = os.environ.get("ENVIRONMENT", "local")
 env_file: str = os.environ.get("ENV_FILE", f"./env/{ENV}.env")
-logger.info(f"Loading environment variables from : {env_file}")
-load_dotenv(env_file)
+# Child processes (e.g. pytest-xdist workers) inherit the loaded environment,
+# so only the first process needs to read the env file
+if os.environ.get("CONFIG_ENV_LOADED") != env_file:
+    logger.info(f"Loading environment variables from : {env_file}")
+    load_dotenv(env_file)
+    os.environ["CONFIG_ENV_LOADED"] = env_file
 
 
 class Config(BaseSettings):
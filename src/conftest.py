@@ -2,54 +2,57 @@
 Pytest configuration and fixtures for the {{project_slug}}_be project.
 """
 
-import os
-import uuid
+import json
 from unittest.mock import patch
 
-import django
 import pytest
-from django.conf import settings
 from django.contrib.auth.models import User
-from django.core import mail
-from django.test import RequestFactory
+from django.core.cache import cache
+from django.test import Client, RequestFactory
 
 
-def django_db_setup(worker_id):
+class APIClient(Client):
     """
-    Configure the test database for parallel execution.
-    Each worker gets its own database to avoid conflicts.
+    Django test client with helpers for sending JSON bodies.
     """
-    if worker_id == "master":
-        # Single process run
-        db_name = ":memory:"
-    else:
-        # Parallel run - each worker gets its own file-based database
-        db_name = f"test_db_{worker_id}.sqlite3"
 
-    settings.DATABASES["default"] = {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": db_name,
-        "ATOMIC_REQUESTS": False,
-    }
-    django.setup()
+    def post_json(self, path, data=None, **extra):
+        """Post JSON data."""
+        body = json.dumps(data) if data is not None else None
+        return self.post(path, data=body, content_type="application/json", **extra)
+
+    def put_json(self, path, data=None, **extra):
+        """Put JSON data."""
+        body = json.dumps(data) if data is not None else None
+        return self.put(path, data=body, content_type="application/json", **extra)
 
-    # Cleanup after session
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Clear the cache after each test, so cached token statuses don't leak into the
+    next test.
+    """
     yield
+    cache.clear()
+
 
-    # Remove temporary database files (only for parallel workers)
-    if worker_id != "master" and os.path.exists(db_name):
-        try:
-            os.remove(db_name)
-        except OSError:
-            pass  # File might already be cleaned up
+@pytest.fixture(autouse=True)
+def email_queue():
+    """
+    Mock Redis client behind queue_templated_email, so no test needs a server.
+    Payloads pushed by the code under test are in lpush.call_args_list.
+    """
+    with patch("apps.core.tasks._get_redis") as mock_get_redis:
+        yield mock_get_redis.return_value
 
 
 @pytest.fixture
 def user_factory():
     """
     Factory for creating test users.
+    Users are removed by the test's transaction rollback.
     """
-    created_users = []
 
     def _create_user(
         username="testuser",
@@ -65,22 +68,9 @@ def user_factory():
             is_active=is_active,
             **kwargs,
         )
-        created_users.append(user)
         return user
 
-    yield _create_user
-
-    # Cleanup
-    for user in created_users:
-        try:
-            user.delete()
-        except ValueError as err:
-            if (
-                "User object can't be deleted because its id attribute is set to None"
-                in str(err)
-            ):
-                # User is already deleted
-                pass
+    return _create_user
 
 
 @pytest.fixture
@@ -91,10 +81,11 @@ def api_request_factory():
     return RequestFactory()
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_user_data():
     """
     Sample user registration data.
+    Shared by every test in the module, so copy it rather than mutating it.
     """
     return {
         "username": "newuser",
@@ -105,16 +96,6 @@ def sample_user_data():
     }
 
 
-@pytest.fixture
-def mailbox():
-    """
-    Access to the test mailbox.
-    """
-    # Clear any existing emails
-    mail.outbox.clear()
-    return mail.outbox
-
-
 @pytest.fixture
 def mock_send_mail():
     """
@@ -124,20 +105,12 @@ def mock_send_mail():
         yield mock
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def uuid_token():
     """
-    Generate a UUID token for testing.
-    """
-    return str(uuid.uuid4())
-
-
-@pytest.fixture(autouse=True)
-def enable_db_access_for_all_tests(db):
-    """
-    Allow database access for all tests.
+    A well-formed UUID token that no verification or reset record uses.
     """
-    pass
+    return "3f2b8c1e-6d4a-4e9b-a7c5-0d1e2f3a4b5c"
 
 
 @pytest.fixture
@@ -145,27 +118,14 @@ def client(django_db_setup):
     """
     Django test client.
     """
-    from django.test import Client
-
     return Client()
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def api_client(django_db_setup):
     """
-    API test client with JSON support.
+    API test client with JSON support, shared by every test in the module.
     """
-    from django.test import Client
-
-    class APIClient(Client):
-        def post_json(self, path, data=None, **extra):
-            """Post JSON data."""
-            return self.post(path, data=data, content_type="application/json", **extra)
-
-        def put_json(self, path, data=None, **extra):
-            """Put JSON data."""
-            return self.put(path, data=data, content_type="application/json", **extra)
-
     return APIClient()
 
 
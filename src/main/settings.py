@@ -28,8 +28,11 @@ env_dir = BASE_DIR.parent / "env"
 env_name = os.environ.get("ENVIRONMENT", "local")
 env_file = f"{env_name}.env"
 env_path = env_dir / env_file
-if env_path.exists():
+# Child processes (e.g. pytest-xdist workers) inherit the loaded environment,
+# so only the first process needs to read the env file (as in config.py)
+if os.environ.get("SETTINGS_ENV_LOADED") != str(env_path) and env_path.exists():
     load_dotenv(env_path)
+    os.environ["SETTINGS_ENV_LOADED"] = str(env_path)
 
 
 def parse_database_url(url: str | None) -> dict:
@@ -195,3 +198,25 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_ENABLE_UTC = USE_TZ
+# Task modules outside INSTALLED_APPS that the worker and beat must register
+CELERY_IMPORTS = ("apps.core.tasks",)
+CELERY_BEAT_SCHEDULE = {
+    "flush-email-batch": {
+        "task": "apps.core.tasks.flush_email_batch",
+        "schedule": 0.5,
+        # Discard runs that sit in the broker past the next one (e.g. while no
+        # worker is up) rather than letting them pile up
+        "options": {"expires": 0.4},
+    },
+}
+
+# Redis list used to batch outgoing emails (see apps.core.tasks.flush_email_batch)
+EMAIL_QUEUE_URL = os.getenv("EMAIL_QUEUE_URL", CELERY_BROKER_URL)
+
+# Shared by every web worker, so cached token statuses hold across processes
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CACHE_URL", "redis://localhost:6379/1"),
+    }
+}
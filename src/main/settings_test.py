@@ -0,0 +1,36 @@
+"""
+Django settings for running the test suite.
+
+Extends the project settings with overrides that only make sense under test;
+production keeps the defaults from settings.py.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+# The default PBKDF2 hasher dominates the cost of creating and logging in test
+# users, so use a fast (insecure) hasher instead
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+# CommonPasswordValidator loads and decompresses a 20k-word list on first use in
+# every worker, so drop it. The rest stay: UserAttributeSimilarityValidator reads
+# the user's fields, which the one-SELECT password reset test relies on.
+AUTH_PASSWORD_VALIDATORS = [
+    validator
+    for validator in AUTH_PASSWORD_VALIDATORS  # noqa: F405
+    if not validator["NAME"].endswith(".CommonPasswordValidator")
+]
+
+# Keep each xdist worker's cache to itself; conftest clears it between tests
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# Run Celery tasks in-process, so tests exercise them without a broker
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_TASK_EAGER_PROPAGATES = True
+
+# Test data never needs to survive a crash, so don't wait for the WAL flush on
+# commit. Per-session setting: the server's durability for other databases is
+# unaffected.
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":  # noqa: F405
+    DATABASES["default"].setdefault("OPTIONS", {})["options"] = (  # noqa: F405
+        "-c synchronous_commit=off"
+    )